@@ -23,5 +23,15 @@ do  \
   echo ${file}
   BASENAME=$(basename "${file}") ; \
   DIR=$(dirname "${file}") ; \
-  cd ${CURRENTDIR}/${DIR} && python3 -m unittest ${BASENAME}
+  # run each test of the file in its own process, in parallel
+  cd ${CURRENTDIR}/${DIR} && \
+  python3 -c 'import sys, unittest
+def ids(suite):
+    for test in suite:
+        if isinstance(test, unittest.TestSuite):
+            yield from ids(test)
+        else:
+            yield test.id()
+print("\n".join(ids(unittest.defaultTestLoader.loadTestsFromName(sys.argv[1]))))' \
+    "${BASENAME%.py}" | xargs -P "$(nproc)" -n 1 python3 -m unittest
 done
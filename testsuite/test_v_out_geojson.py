@@ -17,56 +17,79 @@
 #
 ########################################################################################
 
+import filecmp
+import json
 import os
+import re
+import shutil
+import tempfile
 
 from grass.gunittest.case import TestCase
 from grass.gunittest.main import test
 from grass.gunittest.gmodules import SimpleModule
+import grass.script as gs
 
 
 class TestVOutGeojson(TestCase):
     area_file = "data/area.geojson"
     geojson_epsg4326 = "data/area_epsg4326.geojson"
     geojson_epsg3358 = "data/area_epsg3358.geojson"
-    geojson_stdout = (
-        '{"crs": {"properties": '
-        '{"name": "urn:ogc:def:crs:OGC:1.3:CRS84"}, "type": "name"}, '
-        '"features": [{"geometry": {"coordinates": '
-        "[[[-78.802185, 35.894613], [-78.809052, 35.894057], "
-        "[-78.817978, 35.890163], [-78.839951, 35.861787], "
-        "[-78.879776, 35.845091], [-78.894196, 35.825608], "
-        "[-78.881149, 35.7805], [-78.894196, 35.754314], "
-        "[-78.876343, 35.696341], [-78.835831, 35.686302], "
-        "[-78.748398, 35.684629], [-78.660965, 35.682956], "
-        "[-78.573532, 35.681283], [-78.540916, 35.717798], "
-        "[-78.508301, 35.754314], [-78.515854, 35.825608], "
-        "[-78.558426, 35.870134], [-78.62915, 35.903512], "
-        "[-78.698502, 35.915747], [-78.802185, 35.894613]]], "
-        '"type": "Polygon"}, "properties": '
-        '{"cat": 1}, "type": "Feature"}], "name": "tmp_test_area", '
-        '"type": "FeatureCollection"}\n'
-    )
-    pid_str = str(os.getpid())
     area = "tmp_test_area"
-    region = "region_%s" % pid_str
-    geojson_file = "geoson_%s.geojson" % pid_str
 
     @classmethod
     def setUpClass(self):
         """Ensures expected computational region and generated data"""
+        # use own GISRC, GISDBASE and mapset per test process, so that test
+        # processes running in parallel do not share maps, region or cached
+        # locations of v.out.geojson
+        env = gs.gisenv()
+        self.old_gisrc = os.environ["GISRC"]
+        self.old_dbase = env["GISDBASE"]
+        self.location = env["LOCATION_NAME"]
+        self.old_mapset = env["MAPSET"]
+        # the test location is linked into the temporary GISDBASE
+        self.dbase = tempfile.mkdtemp(prefix="tmp_test_v_out_geojson_")
+        os.symlink(
+            os.path.join(self.old_dbase, self.location),
+            os.path.join(self.dbase, self.location),
+        )
+        self.gisrc = gs.tempfile()
+        shutil.copyfile(self.old_gisrc, self.gisrc)
+        os.environ["GISRC"] = self.gisrc
+        self.mapset = "tmp_test_v_out_geojson_%d" % os.getpid()
+        self.runModule(
+            "g.mapset",
+            mapset=self.mapset,
+            location=self.location,
+            dbase=self.dbase,
+            flags="c",
+        )
         # import general area
         self.runModule("v.import", input=self.area_file, output=self.area)
-        # set temp region
-        self.runModule("g.region", save=self.region)
         # set region to area
         self.runModule("g.region", vector=self.area)
 
     @classmethod
     def tearDownClass(self):
-        """Remove the temporary region and generated data"""
-        self.runModule("g.remove", type="vector", name=self.area, flags="f")
-        self.runModule("g.region", region=self.region)
-        self.runModule("g.remove", type="region", name=self.region, flags="f")
+        """Remove the temporary mapset, GISDBASE and GISRC"""
+        self.runModule(
+            "g.mapset",
+            mapset=self.old_mapset,
+            location=self.location,
+            dbase=self.old_dbase,
+        )
+        os.environ["GISRC"] = self.old_gisrc
+        os.remove(self.gisrc)
+        # the mapset is inside the linked test location
+        shutil.rmtree(os.path.join(self.dbase, self.location, self.mapset))
+        # removes the link and the cached locations created by the tests
+        shutil.rmtree(self.dbase)
+
+    def setUp(self):
+        """Set the output file name of the current test process
+        This is executed before each test run.
+        """
+        self.geojson_file = "geoson_%d.geojson" % os.getpid()
 
     def tearDown(self):
         """Remove the outputs created
@@ -93,9 +116,8 @@ class TestVOutGeojson(TestCase):
         # check to see if output file exists
         self.assertFileExists(self.geojson_file, msg="Output file does not exist")
         # check if the output file is equal to the reference file
-        self.assertFilesEqualMd5(
-            self.geojson_file,
-            self.geojson_epsg4326,
+        self.assertTrue(
+            filecmp.cmp(self.geojson_file, self.geojson_epsg4326, shallow=False),
             msg="Output file is not equal to reference file",
         )
 
@@ -119,8 +141,9 @@ class TestVOutGeojson(TestCase):
         # check to see if output file exists
         self.assertFileExists(self.geojson_file, msg="Output file does not exist")
         # check if the output file is equal to the reference file
-        self.assertFilesEqualMd5(
-            self.geojson_file, geojson, msg="Output file is not equal to reference file"
+        self.assertTrue(
+            filecmp.cmp(self.geojson_file, geojson, shallow=False),
+            msg="Output file is not equal to reference file",
         )
 
     def test_export_to_geojson_epsg3358(self):
@@ -143,8 +166,9 @@ class TestVOutGeojson(TestCase):
         # check to see if output file exists
         self.assertFileExists(self.geojson_file, msg="Output file does not exist")
         # check if the output file is equal to the reference file
-        self.assertFilesEqualMd5(
-            self.geojson_file, geojson, msg="Output file is not equal to reference file"
+        self.assertTrue(
+            filecmp.cmp(self.geojson_file, geojson, shallow=False),
+            msg="Output file is not equal to reference file",
         )
 
     def test_export_to_geojson_stdout(self):
@@ -159,11 +183,84 @@ class TestVOutGeojson(TestCase):
         self.assertIn("GeoJSON of <%s> in EPSG:<%d> is:" % (self.area, epsg), stderr)
         # check geojson in stdout
         stdout = v_out_geojson.outputs.stdout
-        self.assertEqual(self.geojson_stdout, stdout)
+        with open(self.geojson_epsg4326) as f:
+            self.assertEqual(f.read(), stdout)
+
+    def test_export_to_geojson_cached_location(self):
+        """Test that the cached location is reused and kept clean"""
+        cacheloc = os.path.join(self.dbase, "vout_geojson_cache_epsg4326")
+        proj_info = os.path.join(cacheloc, "PERMANENT", "PROJ_INFO")
+        inodes = []
+        for _ in range(2):
+            v_out_geojson = SimpleModule(
+                "v.out.geojson", input=self.area, output="-", verbose=True
+            )
+            self.assertModule(v_out_geojson)
+            self.assertFileExists(proj_info, msg="Cached location does not exist")
+            inodes.append(os.stat(proj_info).st_ino)
+            # check that the reprojected vector map of this call was removed
+            tmpvect = re.search(
+                r"Reprojecting <%s> to <(\S+)> in cached location" % self.area,
+                v_out_geojson.outputs.stderr,
+            )
+            self.assertTrue(tmpvect, msg="Reprojected vector map is not reported")
+            self.assertFalse(
+                os.path.exists(
+                    os.path.join(cacheloc, "PERMANENT", "vector", tmpvect.group(1))
+                ),
+                msg="Reprojected vector map was not removed",
+            )
+        # check that the cached location was not created again
+        self.assertEqual(inodes[0], inodes[1], msg="Cached location was not reused")
+
+    def test_export_to_geojson_rfc7946(self):
+        """Test export to RFC 7946 geojson file"""
+        epsg = 4326
+        v_out_geojson = SimpleModule(
+            "v.out.geojson", input=self.area, output=self.geojson_file, flags="r"
+        )
+        self.assertModule(v_out_geojson)
+        # test that the right map is mentioned in the error message
+        stderr = v_out_geojson.outputs.stderr
+        self.assertIn(
+            "GeoJSON of <%s> in EPSG:<%d> is saved in <%s>"
+            % (self.area, epsg, self.geojson_file),
+            stderr,
+        )
+        # check to see if output file exists
+        self.assertFileExists(self.geojson_file, msg="Output file does not exist")
+        # check that the output has no crs member and is in EPSG:4326
+        with open(self.geojson_file) as f:
+            gj = json.load(f)
+        with open(self.geojson_epsg4326) as f:
+            gj_ref = json.load(f)
+        self.assertNotIn("crs", gj)
+        coords = gj["features"][0]["geometry"]["coordinates"][0][0]
+        coords_ref = gj_ref["features"][0]["geometry"]["coordinates"][0][0]
+        self.assertAlmostEqual(coords[0], coords_ref[0], places=6)
+        self.assertAlmostEqual(coords[1], coords_ref[1], places=6)
+
+    def test_export_to_geojson_rfc7946_epsgerror(self):
+        """Test export to RFC 7946 geojson file with epsg other than 4326"""
+        v_out_geojson = SimpleModule(
+            "v.out.geojson",
+            input=self.area,
+            output=self.geojson_file,
+            epsg=3358,
+            flags="r",
+        )
+        self.assertModuleFail(v_out_geojson)
+        stderr = v_out_geojson.outputs.stderr
+        self.assertIn("RFC 7946 GeoJSON can only be written in EPSG:4326", stderr)
 
     def test_export_to_geojson_stdout_epsgerror(self):
         """Test export in geojson format to stdout"""
         epsg = 335888
+        # temporary files of the current mapset before the run
+        tmpfile = gs.tempfile()
+        tmpdir = os.path.dirname(tmpfile)
+        os.remove(tmpfile)
+        tmpfiles = set(os.listdir(tmpdir))
         v_out_geojson = SimpleModule(
             "v.out.geojson", input=self.area, output="-", epsg=epsg
         )
@@ -177,6 +274,13 @@ class TestVOutGeojson(TestCase):
             "Is this a valid EPSG coordinate system?\n" % (epsg),
             stderr,
         )
+        self.assertIn("Invalid EPSG code <%d>" % epsg, stderr)
+        # test that neither cached location nor temporary GISRC were created
+        cacheloc = os.path.join(self.dbase, "vout_geojson_cache_epsg%d" % epsg)
+        self.assertFalse(os.path.exists(cacheloc), msg="Cached location was created")
+        self.assertEqual(
+            tmpfiles, set(os.listdir(tmpdir)), msg="Temporary file was created"
+        )
 
 
 if __name__ == "__main__":
@@ -48,17 +48,25 @@
 # % answer: 4326
 # % end
 
+# %flag
+# % key: r
+# % description: Write RFC 7946 GeoJSON, reprojected by OGR without helper location (only EPSG:4326)
+# %end
+
 
 import atexit
-import geojson
 import os
 import sys
 
 import grass.script as grass
+from grass.exceptions import CalledModuleError
+
+# name of the location cached for an EPSG code
+CACHELOC = "vout_geojson_cache_epsg%d"
 
 # initialize global vars
-rm_file = []
 TMPLOC = None
+TMPVECT = None
 SRCGISRC = None
 TGTGISRC = None
 GISDBASE = None
@@ -67,22 +75,83 @@ GISDBASE = None
 def cleanup():
     grass.message(_("Cleaning up..."))
     # nuldev = open(os.devnull, 'w')
-    for rm_f in rm_file:
-        if os.path.isfile(rm_f):
-            os.remove(rm_f)
+    # remove reprojected vector map from cached location
+    if TMPVECT and SRCGISRC:
+        grass.run_command(
+            "g.remove",
+            type="vector",
+            name=TMPVECT,
+            flags="f",
+            quiet=True,
+            env=dict(os.environ, GISRC=str(SRCGISRC)),
+            errors="ignore",
+        )
     if TGTGISRC:
         os.environ["GISRC"] = str(TGTGISRC)
-    # remove temp location
-    if TMPLOC:
-        grass.try_rmdir(os.path.join(GISDBASE, TMPLOC))
+    # the cached location is kept to be reused by following calls
     if SRCGISRC:
         grass.try_remove(SRCGISRC)
 
 
-def createTMPlocation(epsg=4326):
+def get_epsg(proj):
+    # get EPSG code from output of g.proj -g
+    if "epsg" in proj:
+        return proj["epsg"]
+    elif "EPSG:" in proj.get("srid", ""):
+        return proj["srid"].split("EPSG:")[1]
+    return None
+
+
+def get_epsg_arg(epsg, proj):
+    # older GRASS versions use epsg instead of srid to define projections
+    if "epsg" in proj:
+        return {"epsg": epsg}
+    else:
+        return {"srid": "EPSG:{}".format(epsg)}
+
+
+def check_epsg(epsg, epsg_arg):
+    # print projection of EPSG code without creating a location, this fails
+    # for unknown EPSG codes
+    try:
+        grass.read_command("g.proj", flags="g", quiet=True, **epsg_arg)
+    except CalledModuleError:
+        grass.fatal(_("Invalid EPSG code <%d>") % epsg)
+
+
+def is_cached_location(location):
+    # a cached location is only complete if its projection and default
+    # region are written
+    permanent = os.path.join(GISDBASE, location, "PERMANENT")
+    return all(
+        os.path.isfile(os.path.join(permanent, f))
+        for f in ("PROJ_INFO", "DEFAULT_WIND")
+    )
+
+
+def create_cached_location(location, epsg_arg):
+    locpath = os.path.join(GISDBASE, location)
+    # build location under a unique name and move it into place, so that
+    # concurrent calls never see a half-built location
+    buildloc = "%s_%s" % (location, grass.tempname(8))
+    try:
+        grass.run_command(
+            "g.proj", flags="c", location=buildloc, quiet=True, **epsg_arg
+        )
+        os.rename(os.path.join(GISDBASE, buildloc), locpath)
+    except (CalledModuleError, OSError):
+        # location may have been created by a concurrent call meanwhile
+        if not is_cached_location(location):
+            grass.fatal(_("Creation of cached location <%s> failed!") % location)
+    finally:
+        grass.try_rmdir(os.path.join(GISDBASE, buildloc))
+
+
+def createTMPlocation(epsg, epsg_arg):
     global TMPLOC, SRCGISRC
     SRCGISRC = grass.tempfile()
-    TMPLOC = "temp_import_location_" + str(os.getpid())
+    atexit.register(cleanup)
+    TMPLOC = CACHELOC % epsg
     f = open(SRCGISRC, "w")
     f.write("MAPSET: PERMANENT\n")
     f.write("GISDBASE: %s\n" % GISDBASE)
@@ -90,24 +159,18 @@ def createTMPlocation(epsg=4326):
     f.write("GUI: text\n")
     f.close()
 
-    proj_test = grass.parse_command("g.proj", flags="g")
-    if "epsg" in proj_test:
-        epsg_arg = {"epsg": epsg}
+    if is_cached_location(TMPLOC):
+        # reuse location cached by a previous call
+        grass.verbose(_("Using cached location with EPSG:%d...") % epsg)
     else:
-        epsg_arg = {"srid": "EPSG:{}".format(epsg)}
-    # create temp location from input without import
-    grass.verbose(_("Creating temporary location with EPSG:%d...") % epsg)
-    grass.run_command("g.proj", flags="c", location=TMPLOC, quiet=True, **epsg_arg)
+        grass.verbose(_("Creating cached location with EPSG:%d...") % epsg)
+        create_cached_location(TMPLOC, epsg_arg)
 
     # switch to temp location
     os.environ["GISRC"] = str(SRCGISRC)
     proj = grass.parse_command("g.proj", flags="g")
-    if "epsg" in proj:
-        new_epsg = proj["epsg"]
-    else:
-        new_epsg = proj["srid"].split("EPSG:")[1]
-    if new_epsg != str(epsg):
-        grass.fatal(_("Creation of temporary location failed!"))
+    if get_epsg(proj) != str(epsg):
+        grass.fatal(_("Cached location <%s> is not in EPSG:%d!") % (TMPLOC, epsg))
 
 
 def get_actual_location():
@@ -118,61 +181,90 @@ def get_actual_location():
     tgtmapset = grassenv["MAPSET"]
     GISDBASE = grassenv["GISDBASE"]
     TGTGISRC = os.environ["GISRC"]
-    return tgtloc, tgtmapset
+    # get projection of actual location
+    proj = grass.parse_command("g.proj", flags="g")
+    return tgtloc, tgtmapset, proj
 
 
 def main():
 
-    global rm_file
-    global TMPLOC, SRCGISRC, TGTGISRC, GISDBASE
+    global TMPVECT
 
     vect = options["input"]
 
-    # set some common environmental variables, like:
-    os.environ.update(
-        dict(
-            GRASS_COMPRESS_NULLS="1",
-            GRASS_COMPRESSOR="LZ4",
-            GRASS_MESSAGE_FORMAT="plain",
-        )
-    )
+    # print messages of called modules without formatting
+    os.environ["GRASS_MESSAGE_FORMAT"] = "plain"
 
     # input vector map to GeoJSON
     grass.message(_("Export input as GeoJSON..."))
     # get actual location, mapset, ...
-    tgtloc, tgtmapset = get_actual_location()
-    # create temporary location with epsg:4326
-    createTMPlocation(int(options["epsg"]))
+    tgtloc, tgtmapset, proj = get_actual_location()
+    tgtepsg = get_epsg(proj)
+    epsg = int(options["epsg"])
 
-    if "@" in vect:
-        [name, vectmapset] = vect.split("@")
+    if options["output"] == "-":
+        # let OGR write to stdout directly
+        geojsonfile = "/vsistdout/"
     else:
-        name, vectmapset = vect, tgtmapset
+        geojsonfile = options["output"]
 
-    # reproject vector
-    grass.run_command(
-        "v.proj",
-        location=tgtloc,
-        mapset=vectmapset,
-        input=name,
-        output=name,
-        quiet=True,
-    )
+    if flags["r"]:
+        if epsg != 4326:
+            grass.fatal(_("RFC 7946 GeoJSON can only be written in EPSG:4326"))
+        # OGR reprojects to EPSG:4326 itself when writing RFC 7946 GeoJSON
+        lco = {"lco": "RFC7946=YES"}
+    else:
+        lco = {}
 
-    if options["output"] == "-":
-        geojsonfile = "%s.geojson" % grass.tempname(8)
-        rm_file.append(geojsonfile)
+    if flags["r"] or (tgtepsg is not None and tgtepsg == str(epsg)):
+        # no reprojection in the helper location needed
+        grass.verbose(_("Skipping reprojection with v.proj"))
+        name = vect
+        layer = vect.split("@")[0]
     else:
-        geojsonfile = options["output"]
-    grass.run_command("v.out.ogr", input=name, output=geojsonfile, format="GeoJSON")
+        epsg_arg = get_epsg_arg(epsg, proj)
+        # check EPSG code before anything is created, a cached location
+        # exists only for valid EPSG codes
+        if not is_cached_location(CACHELOC % epsg):
+            check_epsg(epsg, epsg_arg)
+        # create or reuse cached location with given epsg
+        createTMPlocation(epsg, epsg_arg)
+
+        if "@" in vect:
+            [name, vectmapset] = vect.split("@")
+        else:
+            name, vectmapset = vect, tgtmapset
+
+        # reproject vector under a unique name, the cached location can be
+        # shared by concurrent calls
+        TMPVECT = "%s_%s" % (name, grass.tempname(8))
+        grass.verbose(
+            _("Reprojecting <%s> to <%s> in cached location...") % (name, TMPVECT)
+        )
+        grass.run_command(
+            "v.proj",
+            location=tgtloc,
+            mapset=vectmapset,
+            input=name,
+            output=TMPVECT,
+            quiet=True,
+        )
+        layer = name
+        name = TMPVECT
+
     if options["output"] == "-":
-        with open(geojsonfile) as f:
-            gj = geojson.load(f)
         grass.message(
             _("GeoJSON of <%s> in EPSG:<%s> is:") % (options["input"], options["epsg"])
         )
-        print(gj)
-    else:
+    grass.run_command(
+        "v.out.ogr",
+        input=name,
+        output=geojsonfile,
+        output_layer=layer,
+        format="GeoJSON",
+        **lco,
+    )
+    if options["output"] != "-":
         grass.message(
             _("GeoJSON of <%s> in EPSG:<%s> is saved in <%s>")
             % (options["input"], options["epsg"], options["output"])
@@ -185,5 +277,4 @@ def main():
 
 if __name__ == "__main__":
     options, flags = grass.parser()
-    atexit.register(cleanup)
     sys.exit(main())